@@ -1,8 +1,19 @@
-import os, io, json, base64, hashlib
+import os, io, sys, math, json, base64, hashlib, asyncio, multiprocessing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import aiohttp
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PIL import Image
 import pillow_avif  # registers AVIF
+try: import mozjpeg_lossless_optimization as mozjpeg  # optional, smaller JPEGs
+except ImportError: mozjpeg = None
+try: from pybase64 import b64encode_as_string  # optional, SIMD base64
+except ImportError:
+    def b64encode_as_string(b): return base64.b64encode(b).decode()
 from slugify import slugify
 
 # --- Config ---
@@ -14,27 +25,46 @@ IN_JSON  = "events.json"
 OUT_JSON = "updated_events.json"
 MAX_W = 1200
 Q = 88
+DL_CONCURRENCY = 16   # in-flight image downloads (= connections per host)
 
+@lru_cache(maxsize=4096)
 def sha8(s): return hashlib.md5(s.encode("utf-8")).hexdigest()[:8]
 
+_MONTHS = {'Jan':'01','Feb':'02','Mar':'03','Apr':'04','May':'05','Jun':'06',
+           'Jul':'07','Aug':'08','Sep':'09','Oct':'10','Nov':'11','Dec':'12'}
+
+@lru_cache(maxsize=512)
 def month_folder(date_str):
     # "Sat, 06 Sep 2025" -> "2025/09"
     try:
         parts = date_str.split()
         y, mon = parts[-1], parts[2]
-        m = {'Jan':'01','Feb':'02','Mar':'03','Apr':'04','May':'05','Jun':'06',
-             'Jul':'07','Aug':'08','Sep':'09','Oct':'10','Nov':'11','Dec':'12'}[mon]
-        return f"{y}/{m}"
+        return f"{y}/{_MONTHS[mon]}"
     except: return "undated"
 
+@lru_cache(maxsize=4096)
+def _slug(title): return slugify(title)[:60] or "img"
+
 def to_jpg(data: bytes) -> bytes:
     im = Image.open(io.BytesIO(data))
     if MAX_W and im.width > MAX_W:
-        im = im.resize((MAX_W, int(im.height*MAX_W/im.width)), Image.LANCZOS)
+        if im.format == "JPEG":  # DCT-domain 1/2..1/8 downscale during decode
+            scale = min(8, 2 ** int(math.log2(im.width / MAX_W)))
+            if scale > 1: im.draft("RGB", (im.width//scale, im.height//scale))
+        im = im.resize((MAX_W, int(im.height*MAX_W/im.width)), Image.LANCZOS, reducing_gap=3.0)
     if im.mode not in ("RGB","L"): im = im.convert("RGB")
-    out = io.BytesIO(); im.save(out, "JPEG", quality=Q, optimize=True, progressive=True)
+    out = io.BytesIO()
+    if mozjpeg:
+        im.save(out, "JPEG", quality=Q, subsampling="4:2:0")
+        return mozjpeg.optimize(out.getvalue())
+    im.save(out, "JPEG", quality=Q, subsampling="4:2:0", optimize=True, progressive=True)
     return out.getvalue()
 
+# pooled keep-alive session for all GitHub calls; auth headers are added in main()
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(
+    total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])))
+
 def gh_headers():
     tok = os.environ.get("GITHUB_TOKEN")
     if not tok: raise RuntimeError("Set GITHUB_TOKEN env var.")
@@ -42,37 +72,59 @@ def gh_headers():
 
 def gh_put(path: str, content: bytes, message: str):
     url = f"https://api.github.com/repos/{OWNER}/{REPO}/contents/{path}"
-    r = requests.get(url, headers=gh_headers(), timeout=30)
+    r = SESSION.get(url, timeout=30)
     sha = r.json().get("sha") if r.status_code==200 else None
     payload = {
         "message": message,
-        "content": base64.b64encode(content).decode(),
+        "content": b64encode_as_string(content),
         "branch": BRANCH
     }
     if sha: payload["sha"] = sha
-    x = requests.put(url, headers=gh_headers(), json=payload, timeout=60)
+    x = SESSION.put(url, json=payload, timeout=60)
     x.raise_for_status()
 
-def main():
+async def fetch(sess, sem, url):
+    async with sem:
+        async with sess.get(url) as r:
+            r.raise_for_status()
+            return await r.read()
+
+async def fetch_jpg(sess, sem, pool, url):
+    raw = await fetch(sess, sem, url)
+    return await asyncio.get_running_loop().run_in_executor(pool, to_jpg, raw)
+
+async def convert_all(urls):
+    # download concurrently; each image is encoded as soon as it arrives
+    if not urls: return {}
+    sem = asyncio.Semaphore(DL_CONCURRENCY)
+    conn = aiohttp.TCPConnector(limit=64, limit_per_host=DL_CONCURRENCY)
+    ctx = multiprocessing.get_context("forkserver") if sys.platform.startswith("linux") else None
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=ctx) as pool:
+        async with aiohttp.ClientSession(connector=conn, timeout=aiohttp.ClientTimeout(sock_connect=30, sock_read=30)) as sess:
+            res = await asyncio.gather(*[fetch_jpg(sess, sem, pool, u) for u in urls], return_exceptions=True)
+    return dict(zip(urls, res))
+
+async def main():
+    SESSION.headers.update(gh_headers())
     events = json.load(open(IN_JSON, "r", encoding="utf-8"))
+    jpgs = await convert_all(list(dict.fromkeys(ev["image"] for ev in events if ev.get("image"))))
     out = []
     for ev in events:
         url = ev.get("image"); title = ev.get("title") or ""; date = ev.get("date") or ""
         if not url:
             out.append(ev); continue
         try:
-            raw = requests.get(url, timeout=30); raw.raise_for_status()
-            jpg = to_jpg(raw.content)
-            stem = slugify(title)[:60] or "img"
-            fname = f"{stem}-{sha8(url)}.jpg"
+            jpg = jpgs[url]
+            if isinstance(jpg, BaseException): raise jpg
+            fname = f"{_slug(title)}-{sha8(url)}.jpg"
             rel = f"img/{month_folder(date)}/{fname}"
             gh_put(rel, jpg, f"Add/Update {fname}")
             ev["image_jpg"] = f"{PAGES}/{rel}"
         except Exception as e:
-            ev["image_jpg_error"] = str(e)
+            ev["image_jpg_error"] = str(e) or type(e).__name__
         out.append(ev)
-    json.dump(out, open(OUT_JSON, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
+    Path(OUT_JSON).write_bytes(orjson.dumps(out, option=orjson.OPT_INDENT_2))
     print(f"Done. Wrote {OUT_JSON}")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
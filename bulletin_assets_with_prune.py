@@ -1,8 +1,26 @@
-import os, io, json, csv, base64, hashlib, datetime
+import os, io, sys, math, json, csv, base64, hashlib, datetime, asyncio, random, time, multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-import requests
+import aiohttp
+import orjson
 from PIL import Image
 import pillow_avif  # registers AVIF decoding
+try:
+    import mozjpeg_lossless_optimization  # optional: lossless mozjpeg re-pack of Pillow's JPEGs
+except ImportError:
+    mozjpeg_lossless_optimization = None
+try:
+    from pybase64 import b64encode_as_string            # optional: SIMD base64 for blob uploads
+except ImportError:
+    def b64encode_as_string(data: bytes) -> str:
+        return base64.b64encode(data).decode("ascii")
+try:
+    import numpy as np                                  # optional: --dynamic-quality
+    from skimage.metrics import structural_similarity
+except ImportError:
+    np = structural_similarity = None
 from slugify import slugify
 import argparse
 
@@ -19,7 +37,13 @@ MAP_CSV     = "image_map.csv"            # convenience mapping
 MANIFEST_PATH = "manifest.json"          # committed at repo root
 
 MAX_WIDTH     = 1200                     # resize to this width (email-friendly), 0 = no resize
-JPEG_QUALITY  = 88
+JPEG_QUALITY  = 88                       # fixed quality, and the ceiling for --dynamic-quality
+DYNAMIC_QUALITIES = (85, 80, 75, 70)     # qualities tried, in order, by --dynamic-quality
+SSIM_THRESHOLD    = 0.95                 # lowest acceptable SSIM vs. the resized source
+
+DOWNLOAD_CONCURRENCY = 16                # max in-flight source image downloads (= connections per host)
+GH_CONCURRENCY       = 8                 # max in-flight GitHub API calls (secondary rate limit)
+GH_MAX_RETRIES       = 5                 # retries for rate-limited / conflicting API calls
 
 # Pin folders/files from deletion (prefix match, repo-relative)
 PROTECT_PREFIXES = [
@@ -31,31 +55,69 @@ PROTECT_PREFIXES = [
 def now_iso() -> str:
     return datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
+# md5 stays: the digest is baked into every published filename
+@lru_cache(maxsize=4096)
 def sha8(s: str) -> str:
     return hashlib.md5(s.encode("utf-8")).hexdigest()[:8]
 
+_MONTHS = {'Jan':'01','Feb':'02','Mar':'03','Apr':'04','May':'05','Jun':'06',
+           'Jul':'07','Aug':'08','Sep':'09','Oct':'10','Nov':'11','Dec':'12'}
+
+@lru_cache(maxsize=512)
 def month_folder_from_date(datestr: str) -> str:
     # "Sat, 06 Sep 2025" -> "2025/09"
     try:
         parts = datestr.strip().split()
         year = parts[-1]
         mon  = parts[2]
-        months = {'Jan':'01','Feb':'02','Mar':'03','Apr':'04','May':'05','Jun':'06',
-                  'Jul':'07','Aug':'08','Sep':'09','Oct':'10','Nov':'11','Dec':'12'}
-        return f"{year}/{months.get(mon,'00')}"
+        return f"{year}/{_MONTHS.get(mon,'00')}"
     except Exception:
         return "undated"
 
-def to_jpg_bytes(data: bytes) -> bytes:
+def encode_jpg(im: Image.Image, quality: int) -> bytes:
+    out = io.BytesIO()
+    if mozjpeg_lossless_optimization:
+        # mozjpeg redoes Huffman/progressive scan optimisation itself, so skip Pillow's
+        im.save(out, format="JPEG", quality=quality, subsampling="4:2:0")
+        return mozjpeg_lossless_optimization.optimize(out.getvalue())
+    im.save(out, format="JPEG", quality=quality, subsampling="4:2:0", optimize=True, progressive=True)
+    return out.getvalue()
+
+def lowest_ok_quality(im: Image.Image, jpg: bytes) -> bytes:
+    # Step quality down and keep the smallest encode whose luma SSIM against
+    # the resized source stays >= SSIM_THRESHOLD; flat images go much lower
+    # than textured ones
+    if min(im.size) < 7:    # below SSIM's default window
+        return jpg
+    ref = np.asarray(im.convert("L"))
+    for q in DYNAMIC_QUALITIES:
+        if q >= JPEG_QUALITY:
+            continue
+        candidate = encode_jpg(im, q)
+        decoded = np.asarray(Image.open(io.BytesIO(candidate)).convert("L"))
+        if structural_similarity(ref, decoded, data_range=255) < SSIM_THRESHOLD:
+            break
+        jpg = candidate
+    return jpg
+
+def to_jpg_bytes(data: bytes, dynamic_quality: bool = False) -> bytes:
     im = Image.open(io.BytesIO(data))
     if MAX_WIDTH and im.width > MAX_WIDTH:
+        if im.format == "JPEG":
+            # libjpeg can decode straight to 1/2, 1/4 or 1/8 scale; pick the
+            # largest that still leaves at least MAX_WIDTH pixels for LANCZOS
+            scale = min(8, 2 ** int(math.log2(im.width / MAX_WIDTH)))
+            if scale > 1:
+                im.draft("RGB", (im.width // scale, im.height // scale))
         h = int((MAX_WIDTH / im.width) * im.height)
-        im = im.resize((MAX_WIDTH, h), Image.LANCZOS)
+        # reducing_gap: cheap integer-factor reduce() first, LANCZOS for the rest
+        im = im.resize((MAX_WIDTH, h), Image.LANCZOS, reducing_gap=3.0)
     if im.mode not in ("RGB", "L"):
         im = im.convert("RGB")
-    out = io.BytesIO()
-    im.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
-    return out.getvalue()
+    jpg = encode_jpg(im, JPEG_QUALITY)
+    if dynamic_quality:
+        jpg = lowest_ok_quality(im, jpg)
+    return jpg
 
 def gh_headers():
     token = os.environ.get("GITHUB_TOKEN")
@@ -63,56 +125,158 @@ def gh_headers():
         raise RuntimeError("Missing GITHUB_TOKEN environment variable.")
     return {"Authorization": f"Bearer {token}", "Accept": "application/vnd.github+json"}
 
-def gh_get_sha(path: str):
-    url = f"https://api.github.com/repos/{OWNER}/{REPO}/contents/{path}"
-    r = requests.get(url, headers=gh_headers(), timeout=30)
-    if r.status_code == 200:
-        return r.json().get("sha")
+# repo path -> blob sha on BRANCH; filled once per run by gh_load_tree
+SHA_CACHE = {}
+
+def gh_session() -> aiohttp.ClientSession:
+    # One pooled, pre-authenticated session for every GitHub call in a run,
+    # so TLS/TCP is reused and auth headers are built once
+    connector = aiohttp.TCPConnector(limit_per_host=GH_CONCURRENCY, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector, headers=gh_headers(),
+                                 timeout=aiohttp.ClientTimeout(total=60))
+
+def gh_retry_delay(status: int, headers, body: str, attempt: int):
+    # Seconds to wait before retrying a response, or None if it is final
+    backoff = 2 ** attempt + random.random()
+    if status in (403, 429):
+        retry_after = headers.get("Retry-After")
+        if retry_after:
+            return float(retry_after)
+        reset = headers.get("X-RateLimit-Reset")
+        if headers.get("X-RateLimit-Remaining") == "0" and reset:
+            return max(0.0, int(reset) - time.time()) + random.random()
+        if status == 429 or "rate limit" in body.lower():
+            return backoff
+        return None     # plain 403: bad token / permissions
+    # 409: a Contents API write racing another commit on the branch head
+    if status == 409 or status >= 500:
+        return backoff
     return None
 
-def gh_put_file(path: str, content_bytes: bytes, message: str):
-    url = f"https://api.github.com/repos/{OWNER}/{REPO}/contents/{path}"
-    # If file exists, include its sha to update
-    sha = gh_get_sha(path)
-    payload = {
-        "message": message,
-        "content": base64.b64encode(content_bytes).decode("utf-8"),
-        "branch": BRANCH,
-    }
-    if sha:
-        payload["sha"] = sha
-    resp = requests.put(url, headers=gh_headers(), json=payload, timeout=60)
-    if resp.status_code >= 400:
-        raise RuntimeError(f"PUT {path} failed: {resp.status_code} {resp.text}")
-
-def gh_delete_file(path: str, message: str, dry_run: bool = False) -> bool:
+async def gh_request(session, method: str, url: str, sem=None, **kwargs):
+    # GitHub API call with retry/backoff; returns (status, body text).
+    # Concurrent callers pass a semaphore, held across retries too.
+    async with sem or nullcontext():
+        for attempt in range(GH_MAX_RETRIES + 1):
+            try:
+                async with session.request(method, url, **kwargs) as resp:
+                    status, headers, body = resp.status, resp.headers, await resp.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # e.g. a stale keep-alive connection dropped by the server
+                if attempt == GH_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(2 ** attempt + random.random())
+                continue
+            delay = gh_retry_delay(status, headers, body, attempt) if attempt < GH_MAX_RETRIES else None
+            if delay is None:
+                return status, body
+            await asyncio.sleep(delay)
+
+async def gh_load_tree(session):
+    # One recursive Trees API call replaces a Contents API GET per file
+    url = f"https://api.github.com/repos/{OWNER}/{REPO}/git/trees/{BRANCH}?recursive=1"
+    status, body = await gh_request(session, "GET", url)
+    if status != 200:
+        raise RuntimeError(f"Tree fetch failed: {status} {body}")
+    tree = json.loads(body)
+    if tree.get("truncated"):
+        print("Warning: repo tree listing is truncated; some existing files may not be found.")
+    SHA_CACHE.clear()
+    SHA_CACHE.update({item["path"]: item["sha"] for item in tree["tree"] if item["type"] == "blob"})
+
+async def gh_api(session, method: str, url: str, expect: int, sem=None, **kwargs) -> dict:
+    status, body = await gh_request(session, method, url, sem=sem, **kwargs)
+    if status != expect:
+        raise RuntimeError(f"{method} {url} failed: {status} {body}")
+    return json.loads(body)
+
+async def gh_create_blobs(session, files: list):
+    # POST (path, bytes) files as blobs concurrently.
+    # Returns (path -> blob sha, path -> exception) so one bad upload costs one file.
+    if not files:
+        return {}, {}
+    git = f"https://api.github.com/repos/{OWNER}/{REPO}/git"
+    # return_exceptions: every POST finishes before we return, so none outlives the session
+    sem = asyncio.Semaphore(GH_CONCURRENCY)
+    results = await asyncio.gather(*[
+        gh_api(session, "POST", f"{git}/blobs", 201, sem=sem,
+               json={"content": b64encode_as_string(content), "encoding": "base64"})
+        for _, content in files
+    ], return_exceptions=True)
+    shas, errors = {}, {}
+    for (path, _), result in zip(files, results):
+        if isinstance(result, BaseException):
+            errors[path] = result
+        else:
+            shas[path] = result["sha"]
+    return shas, errors
+
+async def gh_batch_commit(session, files: list, message: str, blobs: dict = None):
+    # Git Data API: one tree, one commit and one ref update for the (path, bytes)
+    # `files` plus any already-uploaded `blobs` (path -> sha)
+    shas, errors = await gh_create_blobs(session, files)
+    if errors:
+        raise next(iter(errors.values()))
+    shas = {**(blobs or {}), **shas}
+    if not shas:
+        return
+    git = f"https://api.github.com/repos/{OWNER}/{REPO}/git"
+    head = (await gh_api(session, "GET", f"{git}/ref/heads/{BRANCH}", 200))["object"]["sha"]
+    base_tree = (await gh_api(session, "GET", f"{git}/commits/{head}", 200))["tree"]["sha"]
+    entries = [{"path": path, "mode": "100644", "type": "blob", "sha": sha}
+               for path, sha in shas.items()]
+    tree = await gh_api(session, "POST", f"{git}/trees", 201, json={"base_tree": base_tree, "tree": entries})
+    commit = await gh_api(session, "POST", f"{git}/commits", 201,
+                          json={"message": message, "tree": tree["sha"], "parents": [head]})
+    # Not forced: fails (rather than clobbering) if the branch moved meanwhile
+    await gh_api(session, "PATCH", f"{git}/refs/heads/{BRANCH}", 200, json={"sha": commit["sha"]})
+    SHA_CACHE.update((entry["path"], entry["sha"]) for entry in entries)
+
+async def gh_delete_file(session, path: str, message: str, dry_run: bool = False) -> bool:
     if dry_run:
         print(f"[DRY-RUN] Would delete: {path}")
         return True
-    sha = gh_get_sha(path)
+    sha = SHA_CACHE.get(path)
     if not sha:
         return False
     url = f"https://api.github.com/repos/{OWNER}/{REPO}/contents/{path}"
     payload = {"message": message, "sha": sha, "branch": BRANCH}
-    r = requests.delete(url, headers=gh_headers(), json=payload, timeout=60)
-    if r.status_code not in (200, 204):
-        raise RuntimeError(f"Delete failed for {path}: {r.status_code} {r.text}")
+    status, body = await gh_request(session, "DELETE", url, json=payload)
+    if status not in (200, 204):
+        raise RuntimeError(f"Delete failed for {path}: {status} {body}")
+    SHA_CACHE.pop(path, None)
     return True
 
-def load_manifest() -> dict:
-    # Try to read manifest from the repo (raw view). If missing, start fresh.
+async def load_manifest(session) -> dict:
+    # In a CI checkout of this repo the manifest is already on disk
+    if os.getenv("CI_LOCAL_CHECKOUT") is not None:
+        try:
+            with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"images": {}}
+    # Otherwise read it from the repo (raw view). If missing, start fresh.
     raw_url = f"https://raw.githubusercontent.com/{OWNER}/{REPO}/{BRANCH}/{MANIFEST_PATH}"
-    r = requests.get(raw_url, timeout=20)
-    if r.status_code == 200:
+    status, body = await gh_request(session, "GET", raw_url)
+    if status == 200:
         try:
-            return json.loads(r.text)
+            return json.loads(body)
         except Exception:
             pass
     return {"images": {}}   # maps path -> record
 
-def save_manifest(manifest: dict):
-    content = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
-    gh_put_file(MANIFEST_PATH, content, "Update manifest.json (auto)")
+def save_manifest(manifest: dict, files: list):
+    # Queued into the run's batch commit rather than written on its own
+    content = orjson.dumps(manifest, option=orjson.OPT_INDENT_2)
+    files.append((MANIFEST_PATH, content))
+
+@lru_cache(maxsize=4096)
+def _slug(title: str) -> str:
+    return slugify(title)[:60] or "img"
+
+def asset_path(title: str, date: str, src: str) -> str:
+    # e.g. "img/2025/09/<slug>-<sha8(src)>.jpg" (path in repo)
+    return f"img/{month_folder_from_date(date)}/{_slug(title)}-{sha8(src)}.jpg"
 
 def is_protected(path: str) -> bool:
     for pref in PROTECT_PREFIXES:
@@ -120,62 +284,134 @@ def is_protected(path: str) -> bool:
             return True
     return False
 
-def process_events(input_json: str, updated_json: str, map_csv: str):
+def encode_pool() -> ProcessPoolExecutor:
+    # One worker per core for decode/resize/encode. forkserver on Linux keeps
+    # workers from forking the parent's event loop and open sockets.
+    ctx = multiprocessing.get_context("forkserver") if sys.platform.startswith("linux") else None
+    return ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=ctx)
+
+async def fetch_image(session, sem, url: str) -> bytes:
+    async with sem:
+        async with session.get(url) as resp:
+            resp.raise_for_status()
+            return await resp.read()
+
+async def fetch_jpg(session, sem, pool, url: str, dynamic_quality: bool) -> bytes:
+    # Encode in a worker process as soon as this download lands, so encodes
+    # overlap with the downloads still in flight.
+    data = await fetch_image(session, sem, url)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, to_jpg_bytes, data, dynamic_quality)
+
+async def convert_images(urls: list, dynamic_quality: bool = False) -> dict:
+    # Returns url -> jpg bytes (or the exception raised for that url)
+    if not urls:
+        return {}
+    sem = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+    # Semaphore matches limit_per_host so no task waits on a pooled connection;
+    # per-socket timeouts (like requests' timeout=30) instead of a total budget
+    connector = aiohttp.TCPConnector(limit=64, limit_per_host=DOWNLOAD_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(sock_connect=30, sock_read=30)
+    with encode_pool() as pool:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            results = await asyncio.gather(
+                *[fetch_jpg(session, sem, pool, url, dynamic_quality) for url in urls],
+                return_exceptions=True,
+            )
+    return dict(zip(urls, results))
+
+async def process_events(session, input_json: str, force: bool = False, dynamic_quality: bool = False):
     with open(input_json, "r", encoding="utf-8") as f:
         events = json.load(f)
 
-    manifest = load_manifest()
+    manifest = await load_manifest(session)
     images = manifest.setdefault("images", {})
+    await gh_load_tree(session)
 
     now = now_iso()
     seen_paths = set()
     rows = [["index","title","original_image","final_jpg_url","status"]]
     updated_events = []
 
+    # Column views of the fields used below, read once per event; only
+    # work_idx (events with an image) goes through the pipeline
+    urls   = [ev.get("image") for ev in events]
+    titles = [ev.get("title") or "" for ev in events]
+    dates  = [ev.get("date") or "" for ev in events]
+    work_idx = [i for i, url in enumerate(urls) if url]
+
+    # Repo path for every event with an image (depends only on title/date/src)
+    paths = {i: asset_path(titles[i], dates[i], urls[i]) for i in work_idx}
+    # Already in the repo from the same source: no download, encode or upload
+    unchanged = set() if force else {
+        i for i in work_idx
+        if SHA_CACHE.get(paths[i]) and images.get(paths[i], {}).get("source") == urls[i]
+    }
+
+    # Each distinct source is downloaded once, all of them concurrently
+    srcs = list(dict.fromkeys(urls[i] for i in work_idx if i not in unchanged))
+    jpgs = await convert_images(srcs, dynamic_quality)
+
+    # Every distinct converted image is uploaded as a blob for the run's single
+    # commit, unless the repo already holds byte-identical output
+    uploads, digests = {}, {}
+    for i in work_idx:
+        jpg = jpgs.get(urls[i])
+        if i in unchanged or isinstance(jpg, BaseException):
+            continue
+        path = paths[i]
+        digests[path] = hashlib.md5(jpg).hexdigest()
+        if SHA_CACHE.get(path) and images.get(path, {}).get("content_md5") == digests[path]:
+            continue
+        uploads[path] = jpg
+    blobs, blob_errors = await gh_create_blobs(session, list(uploads.items()))
+
     for i, ev in enumerate(events):
-        src = ev.get("image")
-        title = ev.get("title") or ""
-        date  = ev.get("date") or ""
+        src, title = urls[i], titles[i]
         if not src:
             rows.append([i, title, "", "", "no_image"])
             updated_events.append(ev)
             continue
         try:
-            r = requests.get(src, timeout=30)
-            r.raise_for_status()
-            jpg = to_jpg_bytes(r.content)
-
-            stem = slugify(title)[:60] or "img"
-            fname = f"{stem}-{sha8(src)}.jpg"
-            subdir = month_folder_from_date(date)
-            rel_path = f"img/{subdir}/{fname}"       # path in repo
+            rel_path = paths[i]
             public_url = f"{PAGES_BASE}/{rel_path}"
 
-            gh_put_file(rel_path, jpg, f"Add/Update {fname}")
+            if i in unchanged:
+                status = "unchanged"
+            else:
+                jpg = jpgs[src]
+                if isinstance(jpg, BaseException):
+                    raise jpg
+                if rel_path in blob_errors:
+                    raise blob_errors[rel_path]
+                status = "ok"
             ev["image_jpg"] = public_url
-            rows.append([i, title, src, public_url, "ok"])
+            rows.append([i, title, src, public_url, status])
             updated_events.append(ev)
 
             rec = images.get(rel_path, {"first_added": now, "title": title, "source": src})
             rec["last_seen"] = now
             rec["title"] = title or rec.get("title")
             rec["source"] = src
+            if rel_path in digests:
+                rec["content_md5"] = digests[rel_path]
             images[rel_path] = rec
             seen_paths.add(rel_path)
 
         except Exception as e:
-            ev["image_jpg_error"] = str(e)
-            rows.append([i, title, src, "", f"error: {e}"])
+            err = str(e) or type(e).__name__   # aiohttp timeouts stringify to ""
+            ev["image_jpg_error"] = err
+            rows.append([i, title, src, "", f"error: {err}"])
             updated_events.append(ev)
 
-    with open(updated_json, "w", encoding="utf-8") as f:
-        json.dump(updated_events, f, ensure_ascii=False, indent=2)
+    return manifest, seen_paths, blobs, updated_events, rows
+
+def write_outputs(updated_json: str, map_csv: str, updated_events: list, rows: list):
+    Path(updated_json).write_bytes(orjson.dumps(updated_events, option=orjson.OPT_INDENT_2))
     with open(map_csv, "w", newline="", encoding="utf-8") as f:
         csv.writer(f).writerows(rows)
 
-    return manifest, seen_paths
-
-def prune_old(manifest: dict, seen_paths: set, retention_days: int, dry_run: bool = False):
+async def prune_old(session, manifest: dict, seen_paths: set, retention_days: int, dry_run: bool = False):
     cutoff_dt = datetime.datetime.utcnow() - datetime.timedelta(days=retention_days)
     cutoff_iso = cutoff_dt.replace(microsecond=0).isoformat() + "Z"
 
@@ -188,15 +424,46 @@ def prune_old(manifest: dict, seen_paths: set, retention_days: int, dry_run: boo
         if path not in seen_paths and last_seen and last_seen < cutoff_iso:
             to_delete.append(path)
 
+    # Contents API deletes each make a commit, so keep them sequential
     deleted = []
     for path in to_delete:
-        if gh_delete_file(path, f"Prune unused asset (> {retention_days}d): {path}", dry_run=dry_run):
+        if await gh_delete_file(session, path, f"Prune unused asset (> {retention_days}d): {path}", dry_run=dry_run):
             deleted.append(path)
             if not dry_run:
                 manifest["images"].pop(path, None)
 
     return deleted
 
+async def run(args):
+    async with gh_session() as session:
+        manifest, seen_paths, blobs, updated_events, rows = await process_events(
+            session, args.input, force=args.force, dynamic_quality=args.dynamic_quality)
+
+        # One commit publishes the new images and the manifest. The manifest is
+        # always saved (so last_seen gets recorded), dry-run included. If this
+        # commit fails the run stops: no outputs point at unpublished URLs and
+        # nothing is pruned.
+        files = []
+        save_manifest(manifest, files)
+        await gh_batch_commit(session, files, f"Add/Update {len(blobs)} image(s), update manifest.json (auto)",
+                              blobs=blobs)
+        write_outputs(args.output, args.mapcsv, updated_events, rows)
+
+        deleted = []
+        if args.prune:
+            deleted = await prune_old(session, manifest, seen_paths, args.retention, dry_run=args.dry_run)
+            print(f"{'(DRY-RUN) ' if args.dry_run else ''}Prune candidates deleted: {len(deleted)}")
+            if args.dry_run and deleted:
+                for p in deleted:
+                    print("  -", p)
+            if deleted and not args.dry_run:
+                # Pruning happens after the commit above, so publish the manifest
+                # again without the deleted paths
+                files = []
+                save_manifest(manifest, files)
+                await gh_batch_commit(session, files, f"Update manifest.json: pruned {len(deleted)} file(s) (auto)")
+    print(f"Finished. Wrote {args.output} and {args.mapcsv}. {len(deleted)} file(s) {'would be ' if args.dry_run else ''}deleted.")
+
 def main():
     parser = argparse.ArgumentParser(description="Upload JPGs to GitHub Pages, update JSON, and prune old files.")
     parser.add_argument("--input", default=INPUT_JSON, help="Path to events.json")
@@ -205,21 +472,13 @@ def main():
     parser.add_argument("--prune", action="store_true", help="Prune unused assets")
     parser.add_argument("--retention", type=int, default=60, help="Retention days before deletion (default: 60)")
     parser.add_argument("--dry-run", action="store_true", help="Preview deletions (no actual delete)")
+    parser.add_argument("--force", action="store_true", help="Re-process images even if the source is unchanged")
+    parser.add_argument("--dynamic-quality", action="store_true",
+                        help=f"Lower JPEG quality per image while SSIM >= {SSIM_THRESHOLD} (needs numpy, scikit-image)")
     args = parser.parse_args()
-
-    manifest, seen_paths = process_events(args.input, args.output, args.mapcsv)
-
-    deleted = []
-    if args.prune:
-        deleted = prune_old(manifest, seen_paths, args.retention, dry_run=args.dry_run)
-        print(f"{'(DRY-RUN) ' if args.dry_run else ''}Prune candidates deleted: {len(deleted)}")
-        if args.dry_run and deleted:
-            for p in deleted:
-                print("  -", p)
-
-    # Always save manifest (so last_seen gets recorded). In dry-run, we still update manifest for new/seen files.
-    save_manifest(manifest)
-    print(f"Finished. Wrote {args.output} and {args.mapcsv}. {len(deleted)} file(s) {'would be ' if args.dry_run else ''}deleted.")
+    if args.dynamic_quality and structural_similarity is None:
+        parser.error("--dynamic-quality requires numpy and scikit-image")
+    asyncio.run(run(args))
 
 if __name__ == "__main__":
     main()
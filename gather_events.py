@@ -1,8 +1,9 @@
-from playwright.sync_api import sync_playwright
-import json
+from playwright.async_api import async_playwright
+import asyncio
 import os
+from pathlib import Path
+import orjson
 from datetime import datetime
-import time
 
 LOCATIONS = {
     "Chester, CA": "https://allevents.in/chester-ca/all",
@@ -16,106 +17,136 @@ OUTPUT_FILE = "events.json"
 current_year = datetime.now().year
 all_events   = []
 
+# Card images are read from attributes, never rendered, so these are never needed.
+# Scripts stay enabled (the listing is rendered client-side), and so do
+# stylesheets: innerText follows CSS (display:none, text-transform, layout),
+# and div.date must keep its rendered form to parse.
+BLOCKED_RESOURCES = {"image", "media", "font"}
+
+CARD_COUNT_JS = "document.querySelectorAll('li.event-card').length"
+
+# Pulls every card's fields in one browser round trip (instead of ~6 CDP calls per card)
+EXTRACT_CARDS_JS = """() => [...document.querySelectorAll('li.event-card')].map(c => {
+    const img = c.querySelector('img.banner-img');
+    return {
+        title:    c.querySelector('h3')?.innerText?.trim() ?? null,
+        location: c.querySelector('div.subtitle')?.innerText?.trim() ?? null,
+        date:     c.querySelector('div.date')?.innerText?.trim() ?? null,
+        url:      c.querySelector("a[href*='/']")?.getAttribute('href') ?? null,
+        image:    img ? (img.getAttribute('data-src') || img.getAttribute('src')) : null,
+    };
+})"""
+
 def load_existing_events():
     if os.path.exists(OUTPUT_FILE):
-        with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return orjson.loads(Path(OUTPUT_FILE).read_bytes())
     return []
 
+def event_key(e):
+    return (e["title"], e["date"], e.get("location"))
+
 def save_events(events):
     existing = load_existing_events()
-    all_combined = existing + events
 
-    unique_events = {
-        (e["title"], e["date"], e["location"]): e
-        for e in all_combined
-        if e["title"] and e["date"]
-    }
+    # Existing events are already unique; only the new ones need checking
+    seen = {event_key(e) for e in existing}
+    added = []
+    for e in events:
+        key = event_key(e)
+        if e["title"] and e["date"] and key not in seen:
+            seen.add(key)
+            added.append(e)
+    unique_events = existing + added
+
+    Path(OUTPUT_FILE).write_bytes(orjson.dumps(unique_events, option=orjson.OPT_INDENT_2))
+    print(f"✅ Saved {len(unique_events)} total unique events to events.json ({len(added)} new)")
+
+async def block_unneeded(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def scrape_one(browser, location, url):
+    events = []
+    print(f"\n📍 Scraping {location}...")
+    # Own context per location so pages load side by side without sharing state
+    context = await browser.new_context(viewport={"width": 420, "height": 800})
+    await context.route("**/*", block_unneeded)
+    try:
+        page = await context.new_page()
+        await page.goto(url, timeout=60000)
+
+        try:
+            await page.click("button[aria-label='Close']", timeout=3000)
+        except:
+            pass
+
+        await page.wait_for_selector("li.event-card", timeout=30000)
+
+        # Scroll & click View More; move on as soon as new cards render,
+        # stop once a round adds none
+        prev = await page.evaluate(CARD_COUNT_JS)
+        for _ in range(20):
+            try:
+                if await page.query_selector("button:has-text('View More')"):
+                    await page.click("button:has-text('View More')")
+                else:
+                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                await page.wait_for_function(f"n => {CARD_COUNT_JS} > n", arg=prev, timeout=5000)
+            except:
+                break
+            prev = await page.evaluate(CARD_COUNT_JS)
+
+        cards = await page.evaluate(EXTRACT_CARDS_JS)
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(list(unique_events.values()), f, indent=2)
-    print(f"✅ Saved {len(unique_events)} total unique events to events.json")
+        print(f"🧾 Found {len(cards)} event cards in {location}")
 
-def scrape_allevents(locations):
-    all_events = []
+        for card in cards:
+            title         = card["title"] if card["title"] is not None else "Untitled Event"
+            location_text = card["location"]
+            date_text     = card["date"]
+            event_url     = card["url"]
+            image_url     = card["image"]
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(viewport={"width": 420, "height": 800})
-        page = context.new_page()
+            # build the full date string BEFORE parsing
+            full_text = f"{date_text} {current_year}"  # e.g. "Sat, 07 Aug 2025"
 
-        for location, url in locations.items():
-            print(f"\n📍 Scraping {location}...")
             try:
-                page.goto(url, timeout=60000)
-
-                try:
-                    page.click("button[aria-label='Close']", timeout=3000)
-                except:
-                    pass
-
-                page.wait_for_selector("li.event-card", timeout=30000)
-
-                # Scroll & click View More
-                for _ in range(20):
-                    try:
-                        if page.query_selector("button:has-text('View More')"):
-                            page.click("button:has-text('View More')")
-                            time.sleep(2)
-                        else:
-                            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                            time.sleep(2)
-                    except:
-                        break
-
-                cards = page.query_selector_all("li.event-card")
-
-                print(f"🧾 Found {len(cards)} event cards in {location}")
-
-                for card in cards:
-                    title_el    = card.query_selector("h3")
-                    location_el = card.query_selector("div.subtitle")
-                    date_el     = card.query_selector("div.date")
-                    link_el     = card.query_selector("a[href*='/']")
-                    img_el      = card.query_selector("img.banner-img")
-
-                    title         = title_el.inner_text().strip() if title_el else "Untitled Event"
-                    location_text = location_el.inner_text().strip() if location_el else None
-                    date_text     = date_el.inner_text().strip() if date_el else None
-                    event_url     = link_el.get_attribute("href") if link_el else None
-                    image_url     = (
-                        img_el.get_attribute("data-src")
-                        or img_el.get_attribute("src")
-                        if img_el
-                        else None
-                    )
-
-                    # build the full date string BEFORE parsing
-                    full_text = f"{date_text} {current_year}"  # e.g. "Sat, 07 Aug 2025"
-
-                    try:
-                        dt          = datetime.strptime(full_text, "%a, %d %b %Y")
-                        pretty_date = dt.strftime("%a, %d %b %Y")
-                    except (ValueError, TypeError):
-                        pretty_date = None
-
-                    all_events.append({
-                        "image":      image_url,
-                        "title":      title,
-                        "date":       pretty_date,
-                        "location_t": location_text,
-                        "url":        event_url,
-                        "source":     f"AllEvents – {location_text or 'Unknown'}",
-                        "location":   location_text
-                    })
-
-            except Exception as e:
-                print(f"❌ Failed to scrape {location}: {e}")
-
-        browser.close()
-    return all_events
+                dt          = datetime.strptime(full_text, "%a, %d %b %Y")
+                pretty_date = dt.strftime("%a, %d %b %Y")
+            except (ValueError, TypeError):
+                pretty_date = None
+
+            events.append({
+                "image":      image_url,
+                "title":      title,
+                "date":       pretty_date,
+                "location_t": location_text,
+                "url":        event_url,
+                "source":     f"AllEvents – {location_text or 'Unknown'}",
+                "location":   location_text
+            })
+
+    except Exception as e:
+        print(f"❌ Failed to scrape {location}: {e}")
+    finally:
+        await context.close()
+    return events
+
+async def scrape_allevents(locations):
+    # One browser, all locations scraped concurrently; results keep LOCATIONS order
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            results = await asyncio.gather(
+                *[scrape_one(browser, location, url) for location, url in locations.items()]
+            )
+        finally:
+            await browser.close()
+    return [event for events in results for event in events]
 
 if __name__ == "__main__":
-    events = scrape_allevents(LOCATIONS)
+    events = asyncio.run(scrape_allevents(LOCATIONS))
     print(f"\n📦 Scraped {len(events)} new events total.")
     save_events(events)